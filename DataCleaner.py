@@ -1,238 +1,363 @@
-import jsonlines
-import re
-import random
-import string
-import asyncio
-import time
-import json
-import logging
-from langdetect import detect, LangDetectException
-from nltk.tokenize import sent_tokenize
-from collections import Counter
-from functools import partial
-from typing import List, Dict
-import aiohttp
-import nltk
-
-nltk.download('punkt')
-
-logging.basicConfig(level=logging.INFO,
-                    format='%(levelname)s: %(message)s',
-                    filename='preprocess.log',
-                    filemode='w')
-logger = logging.getLogger(__name__)
-
-UI_PHRASES = {
-    "add to cart", "buy now", "click here", "read more", "sign up", "subscribe",
-    "free trial", "learn more", "checkout", "order now", "view details"
-}
-SCRAPER_FAILURES = {"title", "heading", "null", "n/a", "loading...", "error", "undefined"}
-
-LOWER_WORD_THRESHOLD = 5
-UPPER_WORD_THRESHOLD = 400
-
-def remove_urls(text: str) -> str:
-    return re.sub(r'http[s]?://\S+', '', text)
-
-def clean_text(text: str) -> str:
-    text = remove_urls(text)
-    text = re.sub(r'\s+', ' ', text)  # Replace multiple spaces/newlines with a single space
-    text = re.sub(r'[^\w\s]', '', text)
-    return text.strip()
-
-def clean_special_characters(text: str) -> str:
-    return re.sub(r'[^\x00-\x7F\u0900-\u097F\u0A00-\u0A7F\u0980-\u09FF\u0B80-\u0BFF\u0C80-\u0CFF\u2000-\u206F]+', '', text)
-
-def remove_repeated_words(text: str) -> str:
-    return re.sub(r'\b(\w+)\s+\1\b', r'\1', text)
-
-def remove_leading_numbers(text: str) -> str:
-    return re.sub(r'^\d+\s*', '', text)
-
-def segment_sentences(text: str) -> List[str]:
-    sentences = sent_tokenize(text)
-    language_grouped_sentences = []
-    temp_group = []
-    current_language = None
-    for sentence in sentences:
-        try:
-            detected_lang = detect(sentence)
-            if current_language is None:
-                current_language = detected_lang
-            elif detected_lang != current_language:
-                language_grouped_sentences.append(temp_group)
-                temp_group = [sentence]
-                current_language = detected_lang
-            else:
-                temp_group.append(sentence)
-        except LangDetectException:
-            continue
-    if temp_group:
-        language_grouped_sentences.append(temp_group)
-    return language_grouped_sentences
-
-def remove_noise(sentences: List[str]) -> List[str]:
-    clean_sentences = []
-    for sentence in sentences:
-        if len(sentence.split()) > 2 and len(set(sentence)) > 3:
-            clean_sentences.append(sentence)
-    return clean_sentences
-
-def deduplicate(texts: List[str]) -> List[str]:
-    return list(set(texts))
-
-def generate_context(target: str) -> str:
-    templates = [
-        f"This is a definition: {target}",
-        f"The following statement is true: {target}",
-        f"Here is some information: {target}",
-        f"In this context, {target} is the answer.",
-        f"The explanation for this is: {target}"
-    ]
-    return random.choice(templates)
-
-def truncate_context(context: str, answer: str, threshold: float = 0.5) -> str:
-    context_words = context.split()
-    answer_words = answer.split()
-    if not context_words:
-        return context
-    common = sum(1 for word in context_words if word.lower() in {w.lower() for w in answer_words})
-    if common / len(context_words) > threshold and len(context_words) > 6:
-        return ' '.join(context_words[:3] + context_words[-3:])
-    return context
-
-def is_target_double_size(input_text: str, target_value: str) -> bool:
-    return len(target_value) >= 2 * len(input_text)
-
-def has_minimum_word_count(text: str, min_words: int = LOWER_WORD_THRESHOLD) -> bool:
-    return len(text.split()) >= min_words
-
-def is_valid_question(text: str) -> bool:
-    return text.strip().endswith('?')
-
-def is_overly_redundant(input_text: str, answer: str, threshold: float = 0.6) -> bool:
-    input_words = set(input_text.lower().split())
-    answer_words = answer.lower().split()
-    if not answer_words:
-        return True
-    common = sum(1 for word in answer_words if word in input_words)
-    ratio = common / len(answer_words)
-    return ratio >= threshold
-
-def should_include_answer(answer: str) -> bool:
-    if answer.strip().endswith('.'):
-        return True
-    word_count = len(answer.split())
-    unwanted_phrases = UI_PHRASES.union(SCRAPER_FAILURES)
-    if word_count > 200 and not any(phrase in answer.lower() for phrase in unwanted_phrases):
-        return True
-    return False
-
-def has_forbidden_words(answer: str) -> bool:
-    forbidden_words = ['save', 'pdf', 'download','disclaimer','copyright','email'] #add as many as you like
-    word_count = Counter(re.findall(r'\b\w+\b', answer.lower()))
-    return sum(word_count[word] for word in forbidden_words) >= 2
-
-def load_json_data(filename: str) -> List[dict]:
-    with jsonlines.open(filename) as f:
-        return [line for line in f]
-
-def save_incrementally_to_json(data, filename="qa_dataset.json"):
-    with open(filename, "a", encoding="utf-8") as f:
-        json.dump(data, f, indent=4, ensure_ascii=False)
-        f.write("\n")
-
-async def process_data_chunk(data_chunk: List[dict]) -> List[dict]:
-    processed_data = []
-    for entry in data_chunk:
-        if 'input' not in entry or not (entry.get('value') or entry.get('target')):
-            continue
-        
-        input_value = entry['input']
-        target_value = entry.get('value', entry.get('target'))
-        
-        # Remove line breaks and clean text
-        input_value = input_value.replace('\n', ' ').replace('\r', ' ')
-        target_value = target_value.replace('\n', ' ').replace('\r', ' ')
-        
-        cleaned_input = clean_text(input_value)
-        cleaned_input = clean_special_characters(cleaned_input)
-        cleaned_input = remove_repeated_words(cleaned_input)
-        cleaned_input = remove_leading_numbers(cleaned_input)
-        
-        cleaned_target = clean_text(target_value)
-        cleaned_target = clean_special_characters(cleaned_target)
-        cleaned_target = remove_repeated_words(cleaned_target)
-        cleaned_target = remove_leading_numbers(cleaned_target)
-        
-        if not cleaned_target.strip():
-            continue
-
-        target_words = len(cleaned_target.split())
-        processed = False
-        
-        if (target_words > 200 and 
-            should_include_answer(cleaned_target) and 
-            not has_forbidden_words(cleaned_target) and 
-            not any(phrase in cleaned_target.lower() for phrase in UI_PHRASES)):
-            
-            input_word_count = len(cleaned_input.split())
-            if input_word_count < LOWER_WORD_THRESHOLD:
-                additional = ' '.join(cleaned_target.split()[:5])
-                cleaned_input = f"What is {cleaned_input} {additional}?"
-            
-            if not is_valid_question(cleaned_input):
-                cleaned_input = f"What is {cleaned_input}?"
-            
-            if not is_overly_redundant(cleaned_input, cleaned_target):
-                context = generate_context(cleaned_target)
-                context = truncate_context(context, cleaned_target)
-                processed_data.append({
-                    "question": cleaned_input,
-                    "context": context,
-                    "answer": cleaned_target
-                })
-                processed = True
-        
-        if not processed:
-            if (has_minimum_word_count(cleaned_input) and
-                is_target_double_size(cleaned_input, cleaned_target) and
-                should_include_answer(cleaned_target) and
-                not has_forbidden_words(cleaned_target) and
-                not is_overly_redundant(cleaned_input, cleaned_target)):
-                
-                if not is_valid_question(cleaned_input):
-                    if has_minimum_word_count(cleaned_input, LOWER_WORD_THRESHOLD + 2):
-                        cleaned_input = f"What is {cleaned_input}?"
-                    else:
-                        additional = ' '.join(cleaned_target.split()[:5])
-                        cleaned_input = f"What is {cleaned_input} {additional}?"
-                
-                if is_valid_question(cleaned_input):
-                    context = generate_context(cleaned_target)
-                    context = truncate_context(context, cleaned_target)
-                    processed_data.append({
-                        "question": cleaned_input,
-                        "context": context,
-                        "answer": cleaned_target
-                    })
-    
-    return processed_data
-
-async def process_data_in_parallel(data: List[dict], chunk_size: int = 50) -> List[dict]:
-    tasks = []
-    for i in range(0, len(data), chunk_size):
-        tasks.append(process_data_chunk(data[i:i + chunk_size]))
-    results = await asyncio.gather(*tasks)
-    return [item for sublist in results for item in sublist]
-
-async def preprocess_data(filename="abc"):
-    data = load_json_data(filename)
-    processed_data = await process_data_in_parallel(data)
-    save_incrementally_to_json(processed_data)
-
-if __name__ == "__main__":
-    start_time = time.time()
-    asyncio.run(preprocess_data("abc"))
-    end_time = time.time()
+import jsonlines
+import re
+import random
+import string
+import asyncio
+import time
+import json
+import logging
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+import fasttext
+from collections import Counter
+from functools import partial, lru_cache
+from typing import List, Dict
+import aiohttp
+import ahocorasick
+
+# Compiled fastText language identifier; far faster than langdetect and
+# constant-cost per call. Download from https://fasttext.cc/docs/en/language-identification.html
+_LID = fasttext.load_model('lid.176.ftz')
+
+# Short pure-ASCII sentences are overwhelmingly English in this corpus;
+# skip the model for them entirely
+_ASCII_RE = re.compile(r'^[\x00-\x7F]+$')
+_ASCII_FAST_PATH_LEN = 80
+
+# Sentence boundary: terminal punctuation followed by whitespace and an
+# uppercase Latin or Devanagari start. Punkt is far heavier than this corpus
+# of scraped prose needs.
+_SENT_RE = re.compile(r'(?<=[\.!?])\s+(?=[A-Z\u00C0-\u00D6\u00D8-\u00DE\u0900-\u097F])')
+
+@lru_cache(maxsize=8192)
+def detect_language(sentence: str) -> str:
+    if len(sentence) < _ASCII_FAST_PATH_LEN and _ASCII_RE.match(sentence):
+        return 'en'
+    # fastText rejects input containing newlines
+    labels, _ = _LID.predict(sentence.replace('\n', ' '), k=1)
+    return labels[0].removeprefix('__label__')
+
+logging.basicConfig(level=logging.INFO,
+                    format='%(levelname)s: %(message)s',
+                    filename='preprocess.log',
+                    filemode='w')
+logger = logging.getLogger(__name__)
+
+UI_PHRASES = {
+    "add to cart", "buy now", "click here", "read more", "sign up", "subscribe",
+    "free trial", "learn more", "checkout", "order now", "view details"
+}
+SCRAPER_FAILURES = {"title", "heading", "null", "n/a", "loading...", "error", "undefined"}
+
+# One Aho-Corasick automaton over all unwanted phrases: a single C-level pass
+# per document instead of one substring scan per phrase
+_UNWANTED_AC = ahocorasick.Automaton()
+for _phrase in UI_PHRASES | SCRAPER_FAILURES:
+    _UNWANTED_AC.add_word(_phrase, _phrase)
+_UNWANTED_AC.make_automaton()
+
+def contains_unwanted_phrase(text_lower: str) -> bool:
+    return next(_UNWANTED_AC.iter(text_lower), None) is not None
+
+LOWER_WORD_THRESHOLD = 5
+UPPER_WORD_THRESHOLD = 400
+
+# Precompiled once at import time so hot loops reuse the same pattern objects
+_URL_RE = re.compile(r'http[s]?://\S+')
+_WS_RE = re.compile(r'\s+')
+_PUNCT_RE = re.compile(r'[^\w\s]')
+_UNICODE_RE = re.compile(r'[^\x00-\x7F\u0900-\u097F\u0A00-\u0A7F\u0980-\u09FF\u0B80-\u0BFF\u0C80-\u0CFF\u2000-\u206F]+')
+_REPEAT_RE = re.compile(r'\b(\w+)\s+\1\b')
+_LEAD_NUM_RE = re.compile(r'^\d+\s*')
+_WORD_RE = re.compile(r'\b\w+\b')
+
+class _KeepTable(dict):
+    """Translation table that drops punctuation and out-of-range codepoints.
+
+    Decisions are made lazily via the precompiled patterns and memoized, so
+    str.translate performs the punctuation and unicode-range filtering of
+    clean_text + clean_special_characters in a single C-level pass.
+    """
+    def __missing__(self, code):
+        ch = chr(code)
+        keep = not (_PUNCT_RE.match(ch) or _UNICODE_RE.match(ch))
+        result = code if keep else None
+        self[code] = result
+        return result
+
+_KEEP_TABLE = _KeepTable()
+
+def remove_urls(text: str) -> str:
+    return _URL_RE.sub('', text)
+
+def clean_entry_text(text: str) -> str:
+    """Single-pass equivalent of clean_text + clean_special_characters +
+    remove_repeated_words + remove_leading_numbers."""
+    text = _URL_RE.sub('', text).translate(_KEEP_TABLE)
+    text = _WS_RE.sub(' ', text).strip()
+    text = _REPEAT_RE.sub(r'\1', text)
+    return _LEAD_NUM_RE.sub('', text)
+
+def clean_text(text: str) -> str:
+    text = remove_urls(text)
+    text = _WS_RE.sub(' ', text)  # Replace multiple spaces/newlines with a single space
+    text = _PUNCT_RE.sub('', text)
+    return text.strip()
+
+def clean_special_characters(text: str) -> str:
+    return _UNICODE_RE.sub('', text)
+
+def remove_repeated_words(text: str) -> str:
+    return _REPEAT_RE.sub(r'\1', text)
+
+def remove_leading_numbers(text: str) -> str:
+    return _LEAD_NUM_RE.sub('', text)
+
+def segment_sentences(text: str) -> List[str]:
+    sentences = [s for s in _SENT_RE.split(text) if s.strip()]
+    if not sentences:
+        return []
+    # detect_language applies the short-ASCII fast path and memoizes results,
+    # so the repeated boilerplate sentences in this corpus skip the model
+    langs = [detect_language(sentence) for sentence in sentences]
+    language_grouped_sentences = []
+    temp_group = []
+    current_language = None
+    for sentence, detected_lang in zip(sentences, langs):
+        if current_language is None:
+            current_language = detected_lang
+        elif detected_lang != current_language:
+            language_grouped_sentences.append(temp_group)
+            temp_group = [sentence]
+            current_language = detected_lang
+        else:
+            temp_group.append(sentence)
+    if temp_group:
+        language_grouped_sentences.append(temp_group)
+    return language_grouped_sentences
+
+def remove_noise(sentences: List[str]) -> List[str]:
+    clean_sentences = []
+    for sentence in sentences:
+        if len(sentence.split()) > 2 and len(set(sentence)) > 3:
+            clean_sentences.append(sentence)
+    return clean_sentences
+
+def deduplicate(texts: List[str]) -> List[str]:
+    # dict.fromkeys keeps first-seen order, unlike set()
+    return list(dict.fromkeys(texts))
+
+def generate_context(target: str) -> str:
+    templates = [
+        f"This is a definition: {target}",
+        f"The following statement is true: {target}",
+        f"Here is some information: {target}",
+        f"In this context, {target} is the answer.",
+        f"The explanation for this is: {target}"
+    ]
+    return random.choice(templates)
+
+def truncate_context(context: str, answer: str, threshold: float = 0.5,
+                     answer_lower_set: set = None) -> str:
+    context_words = context.split()
+    if not context_words:
+        return context
+    if answer_lower_set is None:
+        answer_lower_set = {w.lower() for w in answer.split()}
+    common = sum(1 for word in context_words if word.lower() in answer_lower_set)
+    if common / len(context_words) > threshold and len(context_words) > 6:
+        return ' '.join(context_words[:3] + context_words[-3:])
+    return context
+
+def is_target_double_size(input_text: str, target_value: str) -> bool:
+    return len(target_value) >= 2 * len(input_text)
+
+def has_minimum_word_count(text: str, min_words: int = LOWER_WORD_THRESHOLD) -> bool:
+    return len(text.split()) >= min_words
+
+def is_valid_question(text: str) -> bool:
+    return text.strip().endswith('?')
+
+def is_overly_redundant(input_text: str, answer: str, threshold: float = 0.6,
+                        answer_words_lower: List[str] = None,
+                        input_words_lower: set = None) -> bool:
+    if input_words_lower is None:
+        input_words_lower = set(input_text.lower().split())
+    if answer_words_lower is None:
+        answer_words_lower = answer.lower().split()
+    total = len(answer_words_lower)
+    if not total:
+        return True
+    # Overlap hits needed before the ratio reaches the threshold; bail out as
+    # soon as the verdict is mathematically settled either way
+    needed = math.ceil(threshold * total)
+    common = 0
+    for i, word in enumerate(answer_words_lower):
+        if word in input_words_lower:
+            common += 1
+            if common >= needed:
+                return True
+        elif common + (total - i - 1) < needed:
+            return False
+    return False
+
+def should_include_answer(answer: str, answer_lower: str = None, word_count: int = None) -> bool:
+    if answer.strip().endswith('.'):
+        return True
+    if word_count is None:
+        word_count = len(answer.split())
+    if answer_lower is None:
+        answer_lower = answer.lower()
+    if word_count > 200 and not contains_unwanted_phrase(answer_lower):
+        return True
+    return False
+
+_FORBIDDEN_WORDS = frozenset({'save', 'pdf', 'download', 'disclaimer', 'copyright', 'email'}) #add as many as you like
+
+def has_forbidden_words(answer: str, answer_lower: str = None) -> bool:
+    if answer_lower is None:
+        answer_lower = answer.lower()
+    count = 0
+    for match in _WORD_RE.finditer(answer_lower):
+        if match.group() in _FORBIDDEN_WORDS:
+            count += 1
+            if count >= 2:
+                return True
+    return False
+
+def iter_chunks(filename: str, chunk_size: int = 50):
+    """Yield fixed-size chunks of records straight off the JSONL reader."""
+    with jsonlines.open(filename) as f:
+        chunk = []
+        for line in f:
+            chunk.append(line)
+            if len(chunk) == chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+def save_incrementally_to_json(data, filename="qa_dataset.json"):
+    # One compact JSON line per record through a 64KB-buffered writer, so the
+    # output is real JSONL and records never sit in memory as one big dump
+    with open(filename, "a", encoding="utf-8", buffering=65536) as f:
+        for record in data:
+            f.write(json.dumps(record, ensure_ascii=False, separators=(',', ':')) + "\n")
+
+def process_data_chunk(data_chunk: List[dict]) -> List[dict]:
+    processed_data = []
+    for entry in data_chunk:
+        if 'input' not in entry or not (entry.get('value') or entry.get('target')):
+            continue
+        
+        input_value = entry['input']
+        target_value = entry.get('value', entry.get('target'))
+        
+        # Remove line breaks and clean text
+        input_value = input_value.replace('\n', ' ').replace('\r', ' ')
+        target_value = target_value.replace('\n', ' ').replace('\r', ' ')
+        
+        cleaned_input = clean_entry_text(input_value)
+        cleaned_target = clean_entry_text(target_value)
+        
+        if not cleaned_target.strip():
+            continue
+
+        # Derive the lowercase/split views once per entry; strings are
+        # immutable, so every helper below can safely reuse them
+        target_lower = cleaned_target.lower()
+        target_words_list = cleaned_target.split()
+        target_words_lower = target_lower.split()
+        target_lower_set = set(target_words_lower)
+        target_words = len(target_words_list)
+        processed = False
+
+        if (target_words > 200 and
+            should_include_answer(cleaned_target, target_lower, target_words) and
+            not has_forbidden_words(cleaned_target, target_lower) and
+            not contains_unwanted_phrase(target_lower)):
+
+            input_word_count = len(cleaned_input.split())
+            if input_word_count < LOWER_WORD_THRESHOLD:
+                additional = ' '.join(target_words_list[:5])
+                cleaned_input = f"What is {cleaned_input} {additional}?"
+
+            if not is_valid_question(cleaned_input):
+                cleaned_input = f"What is {cleaned_input}?"
+
+            if not is_overly_redundant(cleaned_input, cleaned_target,
+                                       answer_words_lower=target_words_lower):
+                context = generate_context(cleaned_target)
+                context = truncate_context(context, cleaned_target,
+                                           answer_lower_set=target_lower_set)
+                processed_data.append({
+                    "question": cleaned_input,
+                    "context": context,
+                    "answer": cleaned_target
+                })
+                processed = True
+        
+        if not processed:
+            if (has_minimum_word_count(cleaned_input) and
+                is_target_double_size(cleaned_input, cleaned_target) and
+                should_include_answer(cleaned_target, target_lower, target_words) and
+                not has_forbidden_words(cleaned_target, target_lower) and
+                not is_overly_redundant(cleaned_input, cleaned_target,
+                                        answer_words_lower=target_words_lower)):
+
+                if not is_valid_question(cleaned_input):
+                    if has_minimum_word_count(cleaned_input, LOWER_WORD_THRESHOLD + 2):
+                        cleaned_input = f"What is {cleaned_input}?"
+                    else:
+                        additional = ' '.join(target_words_list[:5])
+                        cleaned_input = f"What is {cleaned_input} {additional}?"
+                
+                if is_valid_question(cleaned_input):
+                    context = generate_context(cleaned_target)
+                    context = truncate_context(context, cleaned_target,
+                                               answer_lower_set=target_lower_set)
+                    processed_data.append({
+                        "question": cleaned_input,
+                        "context": context,
+                        "answer": cleaned_target
+                    })
+    
+    return processed_data
+
+async def process_data_in_parallel(chunks, output_filename: str = "qa_dataset.json") -> int:
+    # The chunk work is pure CPU (regex and string handling), so spread it
+    # across cores instead of gathering coroutines on one thread. Chunks are
+    # consumed lazily with a bounded in-flight window, and finished results
+    # stream straight into the JSONL writer, so neither the input file nor
+    # the output ever sits fully in memory.
+    loop = asyncio.get_running_loop()
+    workers = os.cpu_count()
+    total_saved = 0
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = set()
+        for chunk in chunks:
+            pending.add(loop.run_in_executor(pool, process_data_chunk, chunk))
+            if len(pending) >= workers * 2:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for future in done:
+                    records = future.result()
+                    save_incrementally_to_json(records, output_filename)
+                    total_saved += len(records)
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for future in done:
+                records = future.result()
+                save_incrementally_to_json(records, output_filename)
+                total_saved += len(records)
+    return total_saved
+
+async def preprocess_data(filename="abc"):
+    total_saved = await process_data_in_parallel(iter_chunks(filename))
+    logger.info(f"Saved {total_saved} processed entries.")
+
+if __name__ == "__main__":
+    start_time = time.time()
+    asyncio.run(preprocess_data("abc"))
+    end_time = time.time()
     logger.info(f"Data preprocessing completed in {end_time - start_time:.2f} seconds.")
\ No newline at end of file
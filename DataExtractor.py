@@ -1,16 +1,18 @@
 import sys
-import requests
-from bs4 import BeautifulSoup
+import asyncio
+import aiohttp
+from lxml import etree, html as lxml_html
 import json
 import os
 import time
 from langdetect import detect, LangDetectException
-from requests.exceptions import RequestException, Timeout
 import random
-import pdfplumber
+import re
+import pymupdf
 from duckduckgo_search import DDGS
-from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import ProcessPoolExecutor
 import threading
+import queue
 
 sys.stdout.reconfigure(encoding='utf-8')
 
@@ -34,12 +36,15 @@ os.makedirs(PDF_FILE_DIR, exist_ok=True)
 # Thread lock for safe file writing
 file_lock = threading.Lock()
 
+# Precompiled Devanagari range check (runs in the re C engine)
+_DEVA_RE = re.compile(r'[\u0900-\u097F]')
+
 # =======================
 # HELPER FUNCTIONS
 # =======================
 def contains_nepali(text):
     """Check if the text contains Nepali (Devanagari) characters."""
-    return any('\u0900' <= ch <= '\u097F' for ch in text)
+    return _DEVA_RE.search(text) is not None
 
 def is_eastern_religion(text):
     """Filter out texts mentioning non-Eastern religious terms."""
@@ -56,14 +61,15 @@ def is_valid_content(text):
     except LangDetectException:
         return False
 
+_USER_AGENTS = (
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/109.0.0.0 Safari/537.36",
+    "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/108.0.5359.125 Safari/537.36",
+    "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/107.0.5304.110 Safari/537.36"
+)
+
 def get_random_user_agent():
     """Return a random User-Agent string."""
-    user_agents = [
-        "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/109.0.0.0 Safari/537.36",
-        "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/108.0.5359.125 Safari/537.36",
-        "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/107.0.5304.110 Safari/537.36"
-    ]
-    return random.choice(user_agents)
+    return random.choice(_USER_AGENTS)
 
 def search_duckduckgo(query):
     """Search DuckDuckGo using API while avoiding rate limits."""
@@ -78,56 +84,127 @@ def search_duckduckgo(query):
         print(f"Error in search: {e}")
     return results
 
-def extract_content(url):
-    """Scrape a webpage and extract relevant content."""
+async def extract_content(url, session):
+    """Fetch a webpage and extract relevant content."""
     try:
         headers = {"User-Agent": get_random_user_agent()}  # Use random User-Agent
-        response = requests.get(url, timeout=15, headers=headers)
-        response.raise_for_status()
-        soup = BeautifulSoup(response.text, "html.parser")
-        title = soup.title.string.strip() if soup.title else "No Title"
-        content = " ".join(p.get_text().strip() for p in soup.find_all("p") if p.get_text().strip())
+        async with session.get(url, headers=headers) as response:
+            response.raise_for_status()
+            body = await response.read()
+        if not body.strip():
+            return None, None
+        # Hand the raw bytes to the lxml C parser so it can sniff the encoding
+        tree = lxml_html.fromstring(body)
+        title = tree.findtext('.//title')
+        title = title.strip() if title and title.strip() else "No Title"
+        content = " ".join(p.text_content().strip() for p in tree.iter("p") if p.text_content().strip())
         return title, content
-    except (RequestException, Timeout):
+    except (aiohttp.ClientError, asyncio.TimeoutError, etree.ParserError):
         return None, None
 
-def process_query(query):
+async def fetch_and_save(url, session, semaphore):
+    """Fetch one URL under the semaphore, then validate and save its content."""
+    async with semaphore:
+        title, content = await extract_content(url, session)
+        if title and content and is_valid_content(title + " " + content):
+            save_data({
+                "input": f"Summarize: {title}",
+                "target": content
+            })
+        await asyncio.sleep(random.uniform(2, 5))  # Small delay between requests
+
+async def process_query(query, session, semaphore):
     """Process a single query: search, extract, validate, and save."""
-    urls = search_duckduckgo(query)
+    # DDGS is a blocking client, so run the search in a worker thread
+    urls = await asyncio.to_thread(search_duckduckgo, query)
 
     with open(URL_FILE, "a", encoding="utf-8") as url_file:
         for url in urls:
             url_file.write(url + "\n")
 
-            title, content = extract_content(url)
-            if title and content and is_valid_content(title + " " + content):
-                save_data({
-                    "input": f"Summarize: {title}",
-                    "target": content
-                })
-            time.sleep(random.uniform(2, 5))  # Small delay between requests
-
-def get_next_available_file():
-    """Find the next available file that does not exceed the max file size."""
-    file_index = 1
+    await asyncio.gather(*(fetch_and_save(url, session, semaphore) for url in urls))
+
+# Cached writer state so saves reuse one open handle instead of re-statting
+# every data_part_*.jsonl per record. Guarded by file_lock.
+_writer_state = {"idx": 0, "size": 0, "fh": None}
+
+def _open_next_available_file():
+    """Advance to the next output part with room left; caller holds file_lock."""
+    if _writer_state["fh"] is not None:
+        _writer_state["fh"].close()
+    file_index = _writer_state["idx"] + 1
     while True:
         current_file = os.path.join(OUTPUT_DIR, f"data_part_{file_index}.jsonl")
-        if not os.path.exists(current_file) or os.path.getsize(current_file) < MAX_FILE_SIZE:
-            return current_file
+        size = os.path.getsize(current_file) if os.path.exists(current_file) else 0
+        if size < MAX_FILE_SIZE:
+            _writer_state["idx"] = file_index
+            _writer_state["size"] = size
+            _writer_state["fh"] = open(current_file, "a", encoding="utf-8", buffering=65536)
+            return
         file_index += 1
 
+# Records are queued by the worker threads and written by one background
+# writer thread in batches, so producers never block on file I/O.
+_save_queue = queue.Queue()
+_SAVE_BATCH_SIZE = 128
+_QUEUE_SENTINEL = object()
+
 def save_data(data):
-    """Save data in JSONL format, splitting files if needed."""
+    """Queue a record for the background JSONL writer."""
+    _save_queue.put(data)
+
+def _write_batch(batch):
+    """Write a batch of records as joined JSON lines, rolling files as needed."""
+    lines = [json.dumps(data, ensure_ascii=False) + "\n" for data in batch]
     with file_lock:
-        current_file = get_next_available_file()
-        with open(current_file, "a", encoding="utf-8") as f:
-            f.write(json.dumps(data, ensure_ascii=False) + "\n")
+        pending = []
+        pending_size = 0
+        for line in lines:
+            line_size = len(line.encode("utf-8"))
+            if _writer_state["fh"] is None or _writer_state["size"] + pending_size + line_size > MAX_FILE_SIZE:
+                if pending:
+                    _writer_state["fh"].write("".join(pending))
+                    _writer_state["size"] += pending_size
+                    pending = []
+                    pending_size = 0
+                if _writer_state["fh"] is None or _writer_state["size"] + line_size > MAX_FILE_SIZE:
+                    _open_next_available_file()
+            pending.append(line)
+            pending_size += line_size
+        if pending:
+            _writer_state["fh"].write("".join(pending))
+            _writer_state["size"] += pending_size
+
+def _writer_loop():
+    while True:
+        item = _save_queue.get()
+        if item is _QUEUE_SENTINEL:
+            return
+        batch = [item]
+        while len(batch) < _SAVE_BATCH_SIZE:
+            try:
+                item = _save_queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is _QUEUE_SENTINEL:
+                _write_batch(batch)
+                return
+            batch.append(item)
+        _write_batch(batch)
+
+_writer_thread = threading.Thread(target=_writer_loop, daemon=True)
+_writer_thread.start()
+
+def flush_saves():
+    """Stop the writer thread after draining everything queued so far."""
+    _save_queue.put(_QUEUE_SENTINEL)
+    _writer_thread.join()
 
 def extract_text_from_pdf(pdf_path):
-    """Extract text from PDF using pdfplumber."""
+    """Extract text from PDF using the MuPDF C library."""
     try:
-        with pdfplumber.open(pdf_path) as pdf:
-            text = "\n".join(page.extract_text() or "" for page in pdf.pages if page.extract_text())
+        with pymupdf.open(pdf_path) as doc:
+            text = "\n".join(page.get_text("text") for page in doc)
             return text if text.strip() else None
     except Exception as e:
         print(f"Error extracting text from PDF: {e}")
@@ -142,17 +219,33 @@ def process_pdf(pdf_path):
             "target": text
         })
 
+async def run_queries():
+    """Run all search queries concurrently on one event loop."""
+    semaphore = asyncio.Semaphore(16)  # Bound the number of in-flight fetches
+    timeout = aiohttp.ClientTimeout(total=15)
+    async with aiohttp.ClientSession(timeout=timeout) as session:
+        await asyncio.gather(*(process_query(query, session, semaphore) for query in QUERIES))
+
 # =======================
 # MAIN PROCESSING
 # =======================
 if __name__ == '__main__':
     # Process search queries
-    with ThreadPoolExecutor(max_workers=3) as executor:  # Reduce threads to optimize performance
-        executor.map(process_query, QUERIES)
-
-    # Scan for PDFs in a directory and process them
-    for pdf_file in os.listdir(PDF_FILE_DIR):
-        if pdf_file.lower().endswith('.pdf'):
-            process_pdf(os.path.join(PDF_FILE_DIR, pdf_file))
-
+    asyncio.run(run_queries())
+
+    # Extract PDFs across cores; validation and saving stay in the parent so
+    # records still flow through the in-process writer queue
+    pdf_paths = [os.path.join(PDF_FILE_DIR, pdf_file)
+                 for pdf_file in os.listdir(PDF_FILE_DIR)
+                 if pdf_file.lower().endswith('.pdf')]
+    if pdf_paths:
+        with ProcessPoolExecutor(max_workers=os.cpu_count()) as pool:
+            for text in pool.map(extract_text_from_pdf, pdf_paths):
+                if text and is_valid_content(text):
+                    save_data({
+                        "input": "Summarize the document",
+                        "target": text
+                    })
+
+    flush_saves()
     print("Data collection and PDF processing completed!")
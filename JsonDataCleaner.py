@@ -1,384 +1,575 @@
-import json
-import re
-import random
-import asyncio
-import logging
-import os
-from nltk.tokenize import sent_tokenize
-from collections import Counter
-from typing import List, Dict
-import spacy
-
-# ----------------------------
-# Initialize models and tools
-# ----------------------------
-nlp = spacy.load("en_core_web_md")
-npl = spacy.load("xx_ent_wiki_sm")
-
-# ----------------------------
-# Configurations and Constants
-# ----------------------------
-# Word count limits (adjust these as needed)
-INPUT_LOWER = 4              # Lower bound for input text word count
-TARGET_LOWER = 150            # Lower bound for target/value text word count (adjust as needed)
-TARGET_UPPER = 400           # Upper bound for target/value text word count
-BATCH_SIZE = 10              # Number of queries to process concurrently in a batch
-
-# Maximum output file size (50 MB)
-MAX_FILE_SIZE = 50 * 1024 * 1024
-
-# Hard-coded file paths (input file and output folder)
-INPUT_FILE_PATH = "output_data/data1.jsonl"
-OUTPUT_DIR = "output-data"
-
-# ----------------------------
-# Pre-defined patterns/lists
-# ----------------------------
-UI_PHRASES = {
-    "add to cart", "buy now", "click here", "read more", "sign up", "subscribe",
-    "free trial", "learn more", "checkout", "order now", "view details", 
-    "enable javascript", "please enable", "copyright", "all rights reserved", "All Rights Reserved"
-}
-SCRAPER_FAILURES = {"title", "heading", "null", "n/a", "loading...", "error", "undefined", "404"}
-
-BOILERPLATE_PATTERNS = {
-    'en': [
-        r'bbc\.?com', r'\d{4} [A-Z]+', r'please enable javascript',
-        r'external content', r'privacy policy', r'terms of use',
-        r'© \d{4}', r'all rights reserved', r'published: \d{1,2} [A-Za-z]+ \d{4}',
-        r'Google Scholar', r'doi:\s*\d+\.\d+', r'et al\.', r'pp\.\s*\d+'
-    ],
-    'ne': [
-        r'प्रकाशित: \d{1,2} [^\s]+ \d{4}', r'स्रोत:', r'रिपब्लिक मिडिया',
-        r'लेख्नुहोस्।', r'सहकार्य गरेर', r'अन्य वेबसाइट', r'गुगल स्कोलर'
-    ]
-}
-ACRONYM_PATTERNS = {
-    'en': {r'BSRS-5': 'Brief Symptom Rating Scale-5'},
-    'ne': {r'स्वास्थ्य': 'स्वास्थ्य'}
-}
-forbidden_patterns = {
-    'en': r'\b(?:save|download|pdf|email|phone|advertisement|sponsor)\b',
-    'ne': r'(?:डाउनलोड|ईमेल|विज्ञापन|प्रायोजित|सदस्यता)'
-}
-# Range for Nepali Unicode characters (preserved as is)
-NEPALI_UNICODE_RANGE = r'\u0900-\u097F\u200C-\u200D\u0964-\u0965'
-NEPALI_STOP_WORDS = set([
-    "छ", "गरेको", "गरी", "को", "र", "मा", "भन्ने", "ले", "का", "हो", "भएको",
-    "तर", "यो", "त्यो", "पनि", "भने", "छन्", "गर्न", "हुन", "हुन्छ", "भनिए"
-])
-# ----------------------------
-# Utility functions
-# ----------------------------
-def clean_jsonl_line(line: str) -> str:
-    """Basic cleaning preserving structure."""
-    cleaned = re.sub(r'[\x00-\x08\x0B\x0C\x0E-\x1F\x7F]', '', line)
-    cleaned = cleaned.replace('�', "'")
-    return cleaned.strip()
-
-def repair_jsonl_line(line: str) -> str:
-    """Conservative JSONL repair for common structural issues."""
-    repairs = [
-        (r'([{,]\s*)(\w+)(\s*:)', r'\1"\2"\3'),   # Enclose unquoted keys
-        (r':\s*([^"\d{][^,}]*)', r': "\1"'),       # Enclose unquoted string values
-        (r'"\s*([^"]+?)"\s*([^"])', r'"\1", \2'),   # Insert missing commas
-        (r'\\{', '{'), (r'\\}', '}')                # Fix escaped braces
-    ]
-    for pattern, repl in repairs:
-        line = re.sub(pattern, repl, line)
-    return line
-
-def clean_text(text: str, lang: str) -> str:
-    """
-    Remove URLs, UI phrases, scraper failures, boilerplate and forbidden words;
-    remove extra whitespaces and preserve Nepali Unicode.
-    """
-    text = re.sub(r'http\S+', '', text)
-    for phrase in UI_PHRASES:
-        text = re.sub(re.escape(phrase), '', text, flags=re.IGNORECASE)
-    for phrase in SCRAPER_FAILURES:
-        text = re.sub(re.escape(phrase), '', text, flags=re.IGNORECASE)
-    for pattern in BOILERPLATE_PATTERNS.get(lang, []):
-        text = re.sub(pattern, '', text, flags=re.IGNORECASE)
-    forbidden_pattern = forbidden_patterns.get(lang)
-    if forbidden_pattern:
-        text = re.sub(forbidden_pattern, '', text, flags=re.IGNORECASE)
-    text = re.sub(r'\s+', ' ', text)
-    return text.strip()
-
-def remove_redundant(text: str) -> str:
-    """Remove redundant punctuation/characters."""
-    text = re.sub(r'([!?.,]){2,}', r'\1', text)
-    return text
-
-def clean_generated_text(text: str) -> str:
-    """Remove spurious special tokens (like <extra_id_0>) from the generated text."""
-    return re.sub(r"<extra_id_\d+>", "", text).strip()
-
-def count_capitalized_words(text: str) -> int:
-    """Count words that start with a capital letter."""
-    words = text.split()
-    return sum(1 for word in words if word and word[0].isupper())
-
-def split_text_into_segments(text: str, max_words: int, min_words: int) -> List[str]:
-    """
-    Split the text into segments each with at most `max_words` words.
-    If the last segment is smaller than `min_words`, append it to the previous segment.
-    """
-    words = text.split()
-    if len(words) <= max_words:
-        return [text]
-    segments = []
-    i = 0
-    while i < len(words):
-        segment_words = words[i:i+max_words]
-        if i + max_words < len(words):
-            segments.append(" ".join(segment_words))
-            i += max_words
-        else:
-            if segments and len(segment_words) < min_words:
-                segments[-1] = segments[-1] + " " + " ".join(segment_words)
-            else:
-                segments.append(" ".join(segment_words))
-            break
-    return segments
-
-def identify_relation(keywords):
-    """
-    Identify the key relationships among the keywords (for both Nepali and English).
-    Returns lists of subjects, verbs, objects, locations, and organizations.
-    """
-    # Join the list of keywords into a sentence and parse with spaCy.
-    doc = nlp(" ".join(keywords))
-    
-    subjects = [token for token in doc if token.dep_ in ('nsubj', 'nsubjpass')]
-    verbs = [token for token in doc if token.pos_ == 'VERB']
-    objects = [token for token in doc if token.dep_ in ('dobj', 'attr')]
-    locations = [ent for ent in doc.ents if ent.label_ == 'GPE']  # Geopolitical entity (location)
-    organizations = [ent for ent in doc.ents if ent.label_ == 'ORG']
-    
-    return subjects, verbs, objects, locations, organizations
-
-def enforce_word_count(question: str, min_words: int = 4, max_words: int = 8) -> str:
-    """
-    Ensure the question has between min_words and max_words.
-    If the question is longer than max_words, trim it.
-    """
-    words = question.split()
-    if len(words) > max_words:
-        words = words[:max_words]
-        result = " ".join(words)
-        if not result.endswith('?'):
-            result += '?'
-        return result
-    return question
-
-def generate_summary(text: str, lang: str, top_n: int = 100) -> list:
-    """
-    Extract the top N most frequent words from the given text.
-    For English: use spaCy tokenization and lemmatization.
-    For Nepali: split on whitespace and filter out stop words and words of length <= 3.
-    """
-    try:
-        if lang == 'en':
-            doc = nlp(text)
-            tokens = [token.lemma_.lower() for token in doc if not token.is_stop and token.is_alpha]
-        else:
-            doc = npl(text)
-            tokens = [word for word in text.split() if word not in NEPALI_STOP_WORDS and len(word) > 3]
-        
-        word_counts = Counter(tokens)
-        return [word for word, _ in word_counts.most_common(top_n)]
-    except Exception as e:
-        logging.error(f"Word frequency extraction failed: {e}")
-        return []
-
-def generate_question(text: str, lang: str) -> str:
-    """
-    Generate a logical question from the given text.
-    Supports both English and Nepali.
-    Uses intelligent keyword relations to choose an appropriate question structure.
-    Also writes the generated question to an output file.
-    """
-    if lang not in ['en', 'ne']:
-        return "Question generation in the specified language is not supported yet."
-    
-    # Identify relationships using the keywords.
-    
-    question = ""
-    if lang == 'en':
-        keywords = generate_summary(text, lang)
-        subjects, verbs, objects, locations, organizations = identify_relation(keywords)
-        if locations:
-            question_word = "Where"
-            subject_str = locations[0].text
-            context = [word for word in keywords if word.lower() != subject_str.lower()]
-            question = f"{question_word} {subject_str} " + " ".join(context) + "?"
-        elif subjects and verbs:
-            subject_str = subjects[0].text
-            context = [word for word in keywords if word.lower() != subject_str.lower()]
-            verb_texts = [v.text.lower() for v in verbs]
-            question_word = "What" if "training" in verb_texts else "How"
-            question = f"{question_word} {subject_str} " + " ".join(context) + "?"
-        else:
-            question_word = "What"
-            question = f"{question_word} is the relationship between " + ", ".join(keywords) + "?"
-    
-    else:  # Nepali branch
-        keywords = generate_summary(text, lang)
-        subjects, verbs, objects, locations, organizations = identify_relation(keywords)
-        if locations:
-            question_word = "कहाँ"
-            subject_str = locations[0].text
-            context = [word for word in keywords if word != subject_str]
-            question = f"{question_word} {subject_str} " + " ".join(context) + "?"
-        elif subjects and verbs:
-            subject_str = subjects[0].text
-            context = [word for word in keywords if word != subject_str]
-            question = f"के {subject_str} " + " ".join(context) + " हुन्छ?"
-        else:
-            question_word = "के"
-            question = f"{question_word} यी शब्दहरूको सम्बन्ध के हो: " + ", ".join(keywords) + "?"
-    
-    # Enforce that the question has between 4 and 8 words
-    question = enforce_word_count(question, 4, 8)
-    
-    return question
-
-async def process_single_query(query: Dict) -> List[Dict]:
-    """
-    Process one raw query dictionary and return a list of final query dicts.
-    Each final dict is in the question-context-answer format.
-    Returns an empty list if the query is filtered out.
-    """
-    results = []
-    input_text = query.get('input', '')
-    target_text = query.get('target', '') or query.get('value', '')
-    
-    lang = 'ne' if re.search(f'[{NEPALI_UNICODE_RANGE}]', target_text) else 'en'
-    
-    input_text = clean_text(input_text, lang)
-    target_text = clean_text(target_text, lang)
-    target_text = remove_redundant(target_text)
-    
-    words = target_text.split()
-    if words:
-        cap_count = count_capitalized_words(target_text)
-        if (cap_count / len(words)) > 0.4:
-            return []
-    
-    input_wc = len(input_text.split())
-    target_wc = len(target_text.split())
-    if target_wc < TARGET_LOWER:
-        return []
-    if input_wc < INPUT_LOWER and target_wc < TARGET_LOWER:
-        return []
-    
-    segments = split_text_into_segments(target_text, TARGET_UPPER, TARGET_LOWER)
-    
-    for segment in segments:
-        sentences = sent_tokenize(segment)
-        if not sentences:
-            continue
-        
-        # Define answer as all sentences in the segment
-        answer = " ".join(sentences)
-        # Generate context as a summary of the entire answer
-        context = ' '.join(generate_summary(answer, lang))
-        # Generate a high-quality question from the summarized context
-        question = generate_question(answer, lang)
-        
-        if not (question and context and answer) or (question.strip() == context.strip() == answer.strip()):
-            continue
-        
-        if not semantic_validation(question, context, answer):
-            continue
-        
-        result = {
-            "question": question,
-            "context": context,
-            "answer": answer
-        }
-        results.append(result)
-    
-    return results
-
-def semantic_validation(question: str, context: str, answer: str) -> bool:
-    """
-    Placeholder semantic validation to ensure the three fields
-    are not all identical. (Extend with proper checks as needed.)
-    """
-    return not (question.strip() == context.strip() == answer.strip())
-
-async def process_batch(batch: List[Dict], write_lock: asyncio.Lock, output_writer, batch_number: int):
-    """
-    Process a batch of queries concurrently and then write each processed query
-    in question-context-answer format to the output file (using a lock).
-    """
-    processed_queries = []
-    tasks = [process_single_query(query) for query in batch]
-    batch_results = await asyncio.gather(*tasks)
-    for res in batch_results:
-        if res:
-            processed_queries.extend(res)
-    
-    # Remove duplicate queries (if question, context, and answer are all the same)
-    unique_processed = []
-    seen = set()
-    for item in processed_queries:
-        key = (item["question"].strip(), item["context"].strip(), item["answer"].strip())
-        if key in seen:
-            continue
-        seen.add(key)
-        unique_processed.append(item)
-    
-    async with write_lock:
-        for item in unique_processed:
-            output_writer.write(json.dumps(item, ensure_ascii=False) + "\n")
-        output_writer.flush()
-    logging.info(f"Processed batch {batch_number} and written {len(unique_processed)} queries.")
-
-# ----------------------------
-# Main event loop
-# ----------------------------
-async def main():
-    logging.basicConfig(level=logging.INFO)
-    os.makedirs(OUTPUT_DIR, exist_ok=True)
-    
-    batch = []
-    batch_number = 1
-    file_counter = 1
-    current_output_file = os.path.join(OUTPUT_DIR, f"processed_data_{file_counter}.jsonl")
-    output_writer = open(current_output_file, "w", encoding="utf-8")
-    write_lock = asyncio.Lock()
-    
-    with open(INPUT_FILE_PATH, "r", encoding="utf-8") as infile:
-        for line in infile:
-            line = clean_jsonl_line(line)
-            try:
-                query = json.loads(line)
-            except Exception as e:
-                repaired_line = repair_jsonl_line(line)
-                try:
-                    query = json.loads(repaired_line)
-                except Exception as e2:
-                    logging.error(f"Skipping line due to JSON error: {e2}")
-                    continue
-            batch.append(query)
-            
-            if len(batch) >= BATCH_SIZE:
-                await process_batch(batch, write_lock, output_writer, batch_number)
-                batch_number += 1
-                batch = []
-                if os.path.getsize(current_output_file) >= MAX_FILE_SIZE:
-                    output_writer.close()
-                    file_counter += 1
-                    current_output_file = os.path.join(OUTPUT_DIR, f"processed_data_{file_counter}.jsonl")
-                    output_writer = open(current_output_file, "w", encoding="utf-8")
-        if batch:
-            await process_batch(batch, write_lock, output_writer, batch_number)
-    output_writer.close()
-    logging.info("All queries have been processed.")
-
-if __name__ == "__main__":
+import json
+import re
+import random
+import asyncio
+import hashlib
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from collections import Counter
+from typing import List, Dict
+import spacy
+from spacy.attrs import LEMMA, IS_STOP, IS_ALPHA
+import ahocorasick
+import orjson
+
+# Hyperscan (a JIT'd multi-pattern DFA) is optional; the compiled-re path
+# below remains the fallback
+try:
+    import hyperscan
+except ImportError:
+    hyperscan = None
+
+# ----------------------------
+# Initialize models and tools
+# ----------------------------
+# The full pipeline is loaded once; callers enable only the components they
+# actually need via nlp.select_pipes (the xx_ent_wiki_sm model was loaded but
+# its output never used, so it is gone entirely)
+nlp = spacy.load("en_core_web_md")
+# senter ships load-time disabled in en_core_web_md and select_pipes only
+# selects among enabled pipes, so it must be enabled here before the
+# sentence-splitting passes can pick it up
+nlp.enable_pipe("senter")
+
+# ----------------------------
+# Configurations and Constants
+# ----------------------------
+# Word count limits (adjust these as needed)
+INPUT_LOWER = 4              # Lower bound for input text word count
+TARGET_LOWER = 150            # Lower bound for target/value text word count (adjust as needed)
+TARGET_UPPER = 400           # Upper bound for target/value text word count
+BATCH_SIZE = 10              # Number of queries to process concurrently in a batch
+
+# Maximum output file size (50 MB)
+MAX_FILE_SIZE = 50 * 1024 * 1024
+
+# Hard-coded file paths (input file and output folder)
+INPUT_FILE_PATH = "output_data/data1.jsonl"
+OUTPUT_DIR = "output-data"
+
+# ----------------------------
+# Pre-defined patterns/lists
+# ----------------------------
+UI_PHRASES = {
+    "add to cart", "buy now", "click here", "read more", "sign up", "subscribe",
+    "free trial", "learn more", "checkout", "order now", "view details", 
+    "enable javascript", "please enable", "copyright", "all rights reserved", "All Rights Reserved"
+}
+SCRAPER_FAILURES = {"title", "heading", "null", "n/a", "loading...", "error", "undefined", "404"}
+
+BOILERPLATE_PATTERNS = {
+    'en': [
+        r'bbc\.?com', r'\d{4} [A-Z]+', r'please enable javascript',
+        r'external content', r'privacy policy', r'terms of use',
+        r'© \d{4}', r'all rights reserved', r'published: \d{1,2} [A-Za-z]+ \d{4}',
+        r'Google Scholar', r'doi:\s*\d+\.\d+', r'et al\.', r'pp\.\s*\d+'
+    ],
+    'ne': [
+        r'प्रकाशित: \d{1,2} [^\s]+ \d{4}', r'स्रोत:', r'रिपब्लिक मिडिया',
+        r'लेख्नुहोस्।', r'सहकार्य गरेर', r'अन्य वेबसाइट', r'गुगल स्कोलर'
+    ]
+}
+ACRONYM_PATTERNS = {
+    'en': {r'BSRS-5': 'Brief Symptom Rating Scale-5'},
+    'ne': {r'स्वास्थ्य': 'स्वास्थ्य'}
+}
+forbidden_patterns = {
+    'en': r'\b(?:save|download|pdf|email|phone|advertisement|sponsor)\b',
+    'ne': r'(?:डाउनलोड|ईमेल|विज्ञापन|प्रायोजित|सदस्यता)'
+}
+# Range for Nepali Unicode characters (preserved as is)
+NEPALI_UNICODE_RANGE = r'\u0900-\u097F\u200C-\u200D\u0964-\u0965'
+_NEPALI_RE = re.compile(f'[{NEPALI_UNICODE_RANGE}]')
+NEPALI_STOP_WORDS = set([
+    "छ", "गरेको", "गरी", "को", "र", "मा", "भन्ने", "ले", "का", "हो", "भएको",
+    "तर", "यो", "त्यो", "पनि", "भने", "छन्", "गर्न", "हुन", "हुन्छ", "भनिए"
+])
+
+# Each category is compiled into one alternation at import time, so clean_text
+# scans a document a fixed number of times instead of once per phrase/pattern
+_URL_RE = re.compile(r'http\S+')
+_WS_RE = re.compile(r'\s+')
+_BOIL_RE = {lang: re.compile("|".join(pats), re.IGNORECASE)
+            for lang, pats in BOILERPLATE_PATTERNS.items()}
+_FORBID_RE = {lang: re.compile(pattern, re.IGNORECASE)
+              for lang, pattern in forbidden_patterns.items()}
+_REDUNDANT_RE = re.compile(r'([!?.,]){2,}')
+
+# The UI/scraper phrases are plain literals, so one Aho-Corasick automaton
+# finds all of them in a single O(n) pass with no regex engine at all
+_UI_AC = ahocorasick.Automaton()
+for _phrase in UI_PHRASES | SCRAPER_FAILURES:
+    _UI_AC.add_word(_phrase.lower(), _phrase.lower())
+_UI_AC.make_automaton()
+
+def _strip_ui_phrases(text: str) -> str:
+    """Remove every UI/scraper phrase found by the automaton (case-insensitive)."""
+    spans = [(end - len(phrase) + 1, end + 1) for end, phrase in _UI_AC.iter(text.lower())]
+    if not spans:
+        return text
+    spans.sort()
+    pieces = []
+    prev = 0
+    for start, end in spans:
+        if start > prev:
+            pieces.append(text[prev:start])
+        prev = max(prev, end)
+    pieces.append(text[prev:])
+    return ''.join(pieces)
+
+def _build_hs_database(patterns: List[str]):
+    """Compile one Hyperscan block-mode database over all stripping patterns."""
+    expressions = [p.encode('utf-8') for p in patterns]
+    flags = [hyperscan.HS_FLAG_CASELESS | hyperscan.HS_FLAG_SOM_LEFTMOST |
+             hyperscan.HS_FLAG_UTF8] * len(expressions)
+    database = hyperscan.Database(mode=hyperscan.HS_MODE_BLOCK)
+    database.compile(expressions=expressions, elements=len(expressions), flags=flags)
+    return database
+
+if hyperscan is not None:
+    _HS_LITERALS = [re.escape(p) for p in UI_PHRASES | SCRAPER_FAILURES]
+    _HS_DB = {lang: _build_hs_database(_HS_LITERALS + patterns + [forbidden_patterns[lang]])
+              for lang, patterns in BOILERPLATE_PATTERNS.items()}
+else:
+    _HS_DB = {}
+
+def _strip_matches_hyperscan(text: str, database) -> str:
+    """Remove every matched span in a single linear scan over the UTF-8 bytes."""
+    buf = text.encode('utf-8')
+    spans = []
+    database.scan(buf, match_event_handler=lambda pat_id, start, end, flags, ctx:
+                  spans.append((start, end)))
+    if not spans:
+        return text
+    spans.sort()
+    pieces = []
+    prev = 0
+    for start, end in spans:
+        if start > prev:
+            pieces.append(buf[prev:start])
+        prev = max(prev, end)
+    pieces.append(buf[prev:])
+    return b''.join(pieces).decode('utf-8', errors='ignore')
+# ----------------------------
+# Utility functions
+# ----------------------------
+# Control characters (except tab/LF/CR) deleted from raw lines via
+# bytes.translate — the C equivalent of clean_jsonl_line's regex pass
+_CTRL_DELETE = bytes(c for c in range(32) if c not in (9, 10, 13)) + b'\x7f'
+
+def clean_jsonl_line(line: str) -> str:
+    """Basic cleaning preserving structure."""
+    cleaned = re.sub(r'[\x00-\x08\x0B\x0C\x0E-\x1F\x7F]', '', line)
+    cleaned = cleaned.replace('�', "'")
+    return cleaned.strip()
+
+def repair_jsonl_line(line: str) -> str:
+    """Conservative JSONL repair for common structural issues."""
+    repairs = [
+        (r'([{,]\s*)(\w+)(\s*:)', r'\1"\2"\3'),   # Enclose unquoted keys
+        (r':\s*([^"\d{][^,}]*)', r': "\1"'),       # Enclose unquoted string values
+        (r'"\s*([^"]+?)"\s*([^"])', r'"\1", \2'),   # Insert missing commas
+        (r'\\{', '{'), (r'\\}', '}')                # Fix escaped braces
+    ]
+    for pattern, repl in repairs:
+        line = re.sub(pattern, repl, line)
+    return line
+
+def clean_text(text: str, lang: str) -> str:
+    """
+    Remove URLs, UI phrases, scraper failures, boilerplate and forbidden words;
+    remove extra whitespaces and preserve Nepali Unicode.
+    """
+    text = _URL_RE.sub('', text)
+    hs_database = _HS_DB.get(lang)
+    if hs_database is not None:
+        text = _strip_matches_hyperscan(text, hs_database)
+    else:
+        text = _strip_ui_phrases(text)
+        boilerplate_re = _BOIL_RE.get(lang)
+        if boilerplate_re:
+            text = boilerplate_re.sub('', text)
+        forbidden_re = _FORBID_RE.get(lang)
+        if forbidden_re:
+            text = forbidden_re.sub('', text)
+    text = _WS_RE.sub(' ', text)
+    return text.strip()
+
+def remove_redundant(text: str) -> str:
+    """Remove redundant punctuation/characters."""
+    return _REDUNDANT_RE.sub(r'\1', text)
+
+def clean_generated_text(text: str) -> str:
+    """Remove spurious special tokens (like <extra_id_0>) from the generated text."""
+    return re.sub(r"<extra_id_\d+>", "", text).strip()
+
+_CAP_WORD_RE = re.compile(r'\b[A-Z]\w*')
+
+def count_capitalized_words(text: str) -> int:
+    """Count words that start with a capital letter."""
+    return sum(1 for _ in _CAP_WORD_RE.finditer(text))
+
+def split_text_into_segments(text: str, max_words: int, min_words: int) -> List[str]:
+    """
+    Split the text into segments each with at most `max_words` words.
+    If the last segment is smaller than `min_words`, append it to the previous segment.
+    """
+    words = text.split()
+    if len(words) <= max_words:
+        return [text]
+    segments = []
+    i = 0
+    while i < len(words):
+        segment_words = words[i:i+max_words]
+        if i + max_words < len(words):
+            segments.append(" ".join(segment_words))
+            i += max_words
+        else:
+            if segments and len(segment_words) < min_words:
+                segments[-1] = segments[-1] + " " + " ".join(segment_words)
+            else:
+                segments.append(" ".join(segment_words))
+            break
+    return segments
+
+def relations_from_doc(doc):
+    """Read subjects, verbs, objects, locations and organizations off a parsed Doc."""
+    subjects = [token for token in doc if token.dep_ in ('nsubj', 'nsubjpass')]
+    verbs = [token for token in doc if token.pos_ == 'VERB']
+    objects = [token for token in doc if token.dep_ in ('dobj', 'attr')]
+    locations = [ent for ent in doc.ents if ent.label_ == 'GPE']  # Geopolitical entity (location)
+    organizations = [ent for ent in doc.ents if ent.label_ == 'ORG']
+    return subjects, verbs, objects, locations, organizations
+
+def identify_relation(keywords):
+    """
+    Identify the key relationships among the keywords (for both Nepali and English).
+    Returns lists of subjects, verbs, objects, locations, and organizations.
+    """
+    # Join the list of keywords into a sentence and parse with spaCy.
+    # POS, dependencies and entities are needed here, but not lemmas.
+    with nlp.select_pipes(enable=["tok2vec", "tagger", "parser", "ner"]):
+        doc = nlp(" ".join(keywords))
+    return relations_from_doc(doc)
+
+def enforce_word_count(question: str, min_words: int = 4, max_words: int = 8) -> str:
+    """
+    Ensure the question has between min_words and max_words.
+    If the question is longer than max_words, trim it.
+    """
+    words = question.split()
+    if len(words) > max_words:
+        words = words[:max_words]
+        result = " ".join(words)
+        if not result.endswith('?'):
+            result += '?'
+        return result
+    return question
+
+def generate_summary(text: str, lang: str, top_n: int = 100, doc=None) -> list:
+    """
+    Extract the top N most frequent words from the given text.
+    For English: use spaCy tokenization and lemmatization; a pre-tokenized
+    Doc (e.g. from a batched nlp.pipe call) can be passed in to avoid
+    re-running the pipeline.
+    For Nepali: split on whitespace and filter out stop words and words of length <= 3.
+    """
+    try:
+        if lang == 'en':
+            if doc is None:
+                # Lemmas only — skip the parser and NER passes for summary calls
+                with nlp.select_pipes(enable=["tok2vec", "tagger", "attribute_ruler", "lemmatizer"]):
+                    doc = nlp(text)
+            # Pull lemma/stop/alpha flags into one NumPy array and count lemma
+            # hash ids; only the top N ids round-trip through the string store
+            arr = doc.to_array([LEMMA, IS_STOP, IS_ALPHA])
+            mask = (arr[:, 1] == 0) & (arr[:, 2] == 1)
+            word_counts = Counter(arr[mask, 0].tolist())
+            return [nlp.vocab.strings[lemma_id].lower()
+                    for lemma_id, _ in word_counts.most_common(top_n)]
+        else:
+            # Stream the filtered words straight into the Counter instead of
+            # materializing an intermediate token list
+            word_counts = Counter()
+            word_counts.update(word for word in text.split()
+                               if word not in NEPALI_STOP_WORDS and len(word) > 3)
+            return [word for word, _ in word_counts.most_common(top_n)]
+    except Exception as e:
+        logging.error(f"Word frequency extraction failed: {e}")
+        return []
+
+# Scraped corpora repeat boilerplate segments heavily; cache summaries by a
+# short digest of the text (rather than holding the full strings as keys)
+# and relations by the keyword tuple so duplicates skip the spaCy pipeline.
+_SUMMARY_CACHE: Dict[tuple, list] = {}
+_SUMMARY_CACHE_MAX = 4096
+
+def cached_summary(text: str, lang: str, top_n: int = 100, doc=None) -> list:
+    key = (hashlib.blake2b(text.encode(), digest_size=16).digest(), lang, top_n)
+    keywords = _SUMMARY_CACHE.get(key)
+    if keywords is None:
+        keywords = generate_summary(text, lang, top_n, doc=doc)
+        if len(_SUMMARY_CACHE) >= _SUMMARY_CACHE_MAX:
+            _SUMMARY_CACHE.pop(next(iter(_SUMMARY_CACHE)))
+        _SUMMARY_CACHE[key] = keywords
+    return keywords
+
+@lru_cache(maxsize=4096)
+def cached_identify_relation(keywords_key: tuple):
+    return identify_relation(list(keywords_key))
+
+def generate_question(text: str, lang: str, keywords: list = None, relations=None) -> str:
+    """
+    Generate a logical question from the given text.
+    Supports both English and Nepali.
+    Uses intelligent keyword relations to choose an appropriate question structure.
+    Precomputed keywords/relations (from the batched pipeline) can be passed in
+    so the text is not re-summarized or re-parsed.
+    """
+    if lang not in ['en', 'ne']:
+        return "Question generation in the specified language is not supported yet."
+
+    # Identify relationships using the keywords.
+    if keywords is None:
+        keywords = cached_summary(text, lang)
+    if relations is None:
+        relations = cached_identify_relation(tuple(keywords))
+    subjects, verbs, objects, locations, organizations = relations
+
+    question = ""
+    if lang == 'en':
+        if locations:
+            question_word = "Where"
+            subject_str = locations[0].text
+            context = [word for word in keywords if word.lower() != subject_str.lower()]
+            question = f"{question_word} {subject_str} " + " ".join(context) + "?"
+        elif subjects and verbs:
+            subject_str = subjects[0].text
+            context = [word for word in keywords if word.lower() != subject_str.lower()]
+            verb_texts = [v.text.lower() for v in verbs]
+            question_word = "What" if "training" in verb_texts else "How"
+            question = f"{question_word} {subject_str} " + " ".join(context) + "?"
+        else:
+            question_word = "What"
+            question = f"{question_word} is the relationship between " + ", ".join(keywords) + "?"
+    
+    else:  # Nepali branch
+        if locations:
+            question_word = "कहाँ"
+            subject_str = locations[0].text
+            context = [word for word in keywords if word != subject_str]
+            question = f"{question_word} {subject_str} " + " ".join(context) + "?"
+        elif subjects and verbs:
+            subject_str = subjects[0].text
+            context = [word for word in keywords if word != subject_str]
+            question = f"के {subject_str} " + " ".join(context) + " हुन्छ?"
+        else:
+            question_word = "के"
+            question = f"{question_word} यी शब्दहरूको सम्बन्ध के हो: " + ", ".join(keywords) + "?"
+    
+    # Enforce that the question has between 4 and 8 words
+    question = enforce_word_count(question, 4, 8)
+    
+    return question
+
+def prepare_query(query: Dict):
+    """
+    Clean and filter one raw query dictionary.
+    Returns (lang, segments) ready for the batched NLP phase, or None if the
+    query is filtered out.
+    """
+    input_text = query.get('input', '')
+    target_text = query.get('target', '') or query.get('value', '')
+
+    lang = 'ne' if _NEPALI_RE.search(target_text) else 'en'
+
+    input_text = clean_text(input_text, lang)
+    target_text = clean_text(target_text, lang)
+    target_text = remove_redundant(target_text)
+
+    words = target_text.split()
+    if words:
+        cap_count = count_capitalized_words(target_text)
+        if (cap_count / len(words)) > 0.4:
+            return None
+
+    input_wc = len(input_text.split())
+    target_wc = len(target_text.split())
+    if target_wc < TARGET_LOWER:
+        return None
+    if input_wc < INPUT_LOWER and target_wc < TARGET_LOWER:
+        return None
+
+    return lang, split_text_into_segments(target_text, TARGET_UPPER, TARGET_LOWER)
+
+def semantic_validation(question: str, context: str, answer: str) -> bool:
+    """
+    Placeholder semantic validation to ensure the three fields
+    are not all identical. (Extend with proper checks as needed.)
+    """
+    return not (question.strip() == context.strip() == answer.strip())
+
+# Worker processes inherit the module-level spaCy pipeline (loaded once per
+# worker on import); the pool itself is created on first use
+EXECUTOR = None
+
+def _get_executor():
+    global EXECUTOR
+    if EXECUTOR is None:
+        EXECUTOR = ProcessPoolExecutor(max_workers=os.cpu_count())
+    return EXECUTOR
+
+def process_batch_sync(batch: List[Dict]) -> List[Dict]:
+    """
+    CPU half of batch processing: clean, segment, run the batched spaCy
+    passes and assemble the question-context-answer dicts. Runs inside a
+    worker process.
+    """
+    # Phase 1: clean/segment every query; English sentence splitting happens
+    # on the same Doc the summary uses, below
+    items = []
+    for query in batch:
+        prepared = prepare_query(query)
+        if not prepared:
+            continue
+        lang, segments = prepared
+        for segment in segments:
+            if not segment.strip():
+                continue
+            items.append({"lang": lang, "segment": segment})
+
+    # Phase 2: run spaCy over the whole batch in two nlp.pipe passes (one for
+    # English sentences + summaries, one for keyword relations) instead of
+    # invoking the pipeline once per segment
+    english_indexes = [i for i, item in enumerate(items) if item["lang"] == 'en']
+    if english_indexes:
+        with nlp.select_pipes(enable=["tok2vec", "tagger", "attribute_ruler",
+                                      "lemmatizer", "senter"]):
+            docs = nlp.pipe([items[i]["segment"] for i in english_indexes], batch_size=64)
+            for i, doc in zip(english_indexes, docs):
+                # One Doc supplies both the sentence split and the summary tokens
+                sentences = [sent.text for sent in doc.sents]
+                if not sentences:
+                    continue
+                # Define answer as all sentences in the segment
+                items[i]["answer"] = " ".join(sentences)
+                items[i]["keywords"] = cached_summary(items[i]["answer"], 'en', doc=doc)
+    for item in items:
+        if item["lang"] != 'en':
+            item["answer"] = item["segment"]
+            item["keywords"] = cached_summary(item["answer"], item["lang"])
+    items = [item for item in items if "answer" in item]
+    relation_docs = []
+    if items:
+        with nlp.select_pipes(enable=["tok2vec", "tagger", "parser", "ner"]):
+            relation_docs = list(nlp.pipe([" ".join(item["keywords"]) for item in items],
+                                          batch_size=64))
+
+    # Phase 3: assemble and filter the final question-context-answer dicts
+    processed_queries = []
+    for item, relation_doc in zip(items, relation_docs):
+        answer = item["answer"]
+        # Generate context as a summary of the entire answer
+        context = ' '.join(item["keywords"])
+        # Generate a high-quality question from the summarized context
+        question = generate_question(answer, item["lang"], keywords=item["keywords"],
+                                     relations=relations_from_doc(relation_doc))
+
+        if not (question and context and answer) or (question.strip() == context.strip() == answer.strip()):
+            continue
+        if not semantic_validation(question, context, answer):
+            continue
+        processed_queries.append({
+            "question": question,
+            "context": context,
+            "answer": answer
+        })
+
+    return processed_queries
+
+async def process_batch(batch: List[Dict], write_lock: asyncio.Lock, output_writer, batch_number: int):
+    """
+    Dispatch one batch of queries to the process pool, then write each
+    processed query in question-context-answer format to the output file
+    (using a lock).
+    """
+    loop = asyncio.get_running_loop()
+    processed_queries = await loop.run_in_executor(_get_executor(), process_batch_sync, batch)
+
+    # Remove duplicate queries (if question, context, and answer are all the same)
+    unique_processed = []
+    seen = set()
+    for item in processed_queries:
+        key = (item["question"].strip(), item["context"].strip(), item["answer"].strip())
+        if key in seen:
+            continue
+        seen.add(key)
+        unique_processed.append(item)
+    
+    async with write_lock:
+        for item in unique_processed:
+            output_writer.write(json.dumps(item, ensure_ascii=False) + "\n")
+        output_writer.flush()
+    logging.info(f"Processed batch {batch_number} and written {len(unique_processed)} queries.")
+
+# ----------------------------
+# Main event loop
+# ----------------------------
+async def main():
+    logging.basicConfig(level=logging.INFO)
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
+    
+    batch = []
+    tasks = []
+    batch_number = 1
+    file_counter = 1
+    current_output_file = os.path.join(OUTPUT_DIR, f"processed_data_{file_counter}.jsonl")
+    output_writer = open(current_output_file, "w", encoding="utf-8")
+    write_lock = asyncio.Lock()
+    
+    with open(INPUT_FILE_PATH, "rb") as infile:
+        for raw_line in infile:
+            # Strip control chars and replacement chars in C, then parse with
+            # orjson; only broken lines pay for the regex repair path
+            line = raw_line.translate(None, _CTRL_DELETE).replace(b'\xef\xbf\xbd', b"'").strip()
+            if not line:
+                continue
+            try:
+                query = orjson.loads(line)
+            except Exception:
+                repaired_line = repair_jsonl_line(line.decode("utf-8", errors="replace"))
+                try:
+                    query = json.loads(repaired_line)
+                except Exception as e2:
+                    logging.error(f"Skipping line due to JSON error: {e2}")
+                    continue
+            batch.append(query)
+
+            if len(batch) >= BATCH_SIZE:
+                # Keep one window of batches in flight across the worker
+                # processes; the file-size check only runs between windows so
+                # no in-flight task holds a closed writer
+                tasks.append(asyncio.ensure_future(
+                    process_batch(batch, write_lock, output_writer, batch_number)))
+                batch_number += 1
+                batch = []
+                if len(tasks) >= (os.cpu_count() or 1):
+                    await asyncio.gather(*tasks)
+                    tasks = []
+                    if os.path.getsize(current_output_file) >= MAX_FILE_SIZE:
+                        output_writer.close()
+                        file_counter += 1
+                        current_output_file = os.path.join(OUTPUT_DIR, f"processed_data_{file_counter}.jsonl")
+                        output_writer = open(current_output_file, "w", encoding="utf-8")
+        if batch:
+            tasks.append(asyncio.ensure_future(
+                process_batch(batch, write_lock, output_writer, batch_number)))
+        if tasks:
+            await asyncio.gather(*tasks)
+    output_writer.close()
+    logging.info("All queries have been processed.")
+
+if __name__ == "__main__":
     asyncio.run(main())
\ No newline at end of file
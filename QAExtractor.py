@@ -1,17 +1,16 @@
 import sys
 import os
+import atexit
 import json
-import time
-import hashlib
+import xxhash
 import threading
 import asyncio
 import random
-import io
 import aiohttp
-import pdfplumber
-from bs4 import BeautifulSoup
+import fitz
+from selectolax.parser import HTMLParser
 from duckduckgo_search import DDGS
-from langdetect import detect, LangDetectException
+import fasttext
 import re
 
 sys.stdout.reconfigure(encoding='utf-8')
@@ -68,15 +67,38 @@ def get_random_user_agent():
 
 def load_processed_urls():
     if os.path.exists(URL_FILE):
-        with open(URL_FILE, 'r', encoding='utf-8') as f:
-            return set(line.strip() for line in f)
+        # One bulk read and one split beat the line-iterator protocol
+        # (per-line strip calls and buffered readline overhead)
+        with open(URL_FILE, 'rb') as f:
+            data = f.read()
+        urls = set(data.decode('utf-8').split('\n'))
+        urls.discard('')
+        return urls
     return set()
 
+_pending_urls = []
+_PENDING_URL_FLUSH = 64
+
+def _flush_pending():
+    # Caller holds file_lock
+    if _pending_urls:
+        with open(URL_FILE, 'a', encoding='utf-8') as f:
+            f.write('\n'.join(_pending_urls) + '\n')
+        _pending_urls.clear()
+
 def save_processed_url(url):
+    # The in-memory set is updated immediately so dedup still works;
+    # the open/append/close cycle is amortized over batches of URLs
     with file_lock:
-        with open(URL_FILE, 'a', encoding='utf-8') as f:
-            f.write(url + '\n')
         processed_urls.add(url)
+        _pending_urls.append(url)
+        if len(_pending_urls) >= _PENDING_URL_FLUSH:
+            _flush_pending()
+
+@atexit.register
+def _flush_pending_at_exit():
+    with file_lock:
+        _flush_pending()
 
 def get_output_file():
     index = 1
@@ -86,43 +108,58 @@ def get_output_file():
             return path
         index += 1
 
+def entry_hash(entry):
+    """128-bit XXH3 content hash over the raw text fields — no JSON re-serialization."""
+    return (xxhash.xxh3_128_intdigest(entry['input'].encode()) ^
+            xxhash.xxh3_128_intdigest(entry['value'].encode()))
+
 def save_data(entries):
     if not entries:
         return
 
+    # Hash and serialize outside the lock; a stale read of content_hashes
+    # just means a few extra candidates that the re-check below drops
+    candidates = []
+    for entry in entries:
+        h = entry_hash(entry)
+        if h not in content_hashes:
+            candidates.append((json.dumps(entry, ensure_ascii=False), h))
+    if not candidates:
+        return
+
     with file_lock:
         output_file = get_output_file()
         with open(output_file, 'a', encoding='utf-8') as f:
-            for entry in entries:
-                entry_hash = hashlib.md5(json.dumps(entry, sort_keys=True).encode()).hexdigest()
-                if entry_hash not in content_hashes:
-                    f.write(json.dumps(entry, ensure_ascii=False) + '\n')
-                    content_hashes.add(entry_hash)
+            for line, h in candidates:
+                if h not in content_hashes:
+                    f.write(line + '\n')
+                    content_hashes.add(h)
+
+# fastText language ID model (https://fasttext.cc/docs/en/language-identification.html)
+_lid = fasttext.load_model('lid.176.ftz')
 
 def is_valid_content(text):
     if len(text) < MIN_CONTENT_LENGTH:
         return False
-    try:
-        return detect(text) == 'en'
-    except LangDetectException:
-        return False
+    # A 4KB prefix is plenty for language ID; fastText wants single-line input
+    labels, _ = _lid.predict(text[:4096].replace('\n', ' '), k=1)
+    return labels[0] == '__label__en'
+
+_HEADING_RE = re.compile(r'(?:## |\b[A-Z][A-Za-z\s]+:|\d+\.\s+[A-Z][a-z]+)')
 
 def extract_pairs(content):
     pairs = []
-    
-    # Try extracting heading-content patterns
-    heading_re = r'(?:## |\b[A-Z][A-Za-z\s]+:|\d+\.\s+[A-Z][a-z]+)'
-    sections = re.split(f'({heading_re})', content)
-    
-    current_heading = None
-    for section in sections:
-        section = section.strip()
-        if re.match(heading_re, section):
-            current_heading = section
-        elif current_heading:
-            if len(section) > len(current_heading) * 2:
-                pairs.append((current_heading, section))
-                current_heading = None
+
+    # Try extracting heading-content patterns: walk the heading matches and
+    # slice the body up to the next heading, instead of re.split materializing
+    # every token of the document in one list
+    matches = list(_HEADING_RE.finditer(content))
+    for match, next_match in zip(matches, matches[1:] + [None]):
+        heading = match.group().strip()
+        body_end = next_match.start() if next_match else len(content)
+        section = content[match.end():body_end].strip()
+        if heading and len(section) > len(heading) * 2:
+            pairs.append((heading, section))
     
     # Fallback: split into paragraphs
     if not pairs:
@@ -133,36 +170,36 @@ def extract_pairs(content):
     
     return pairs
 
-async def process_pdf(url, session):
+def process_pdf_bytes(data):
+    """Extract pairs from already-downloaded PDF bytes."""
     try:
-        async with session.get(url) as response:
-            content = await response.read()
-            with pdfplumber.open(io.BytesIO(content)) as pdf:
-                text = "\n".join(page.extract_text() or "" for page in pdf.pages)
-                if is_valid_content(text):
-                    return extract_pairs(text)
+        doc = fitz.open(stream=data, filetype='pdf')
+        text = "\n".join(page.get_text("text") for page in doc)
+        doc.close()
+        if is_valid_content(text):
+            return extract_pairs(text)
     except Exception as e:
-        print(f"Error processing PDF {url}: {e}")
+        print(f"Error processing PDF content: {e}")
     return []
 
-async def process_html(url, session):
+def process_html_bytes(data):
+    """Extract pairs from already-downloaded HTML bytes."""
     try:
-        async with session.get(url) as response:
-            html = await response.text()
-            soup = BeautifulSoup(html, 'html.parser')
-            
-            # Remove unwanted elements
-            for element in soup(['script', 'style', 'nav', 'footer', 'header', 'noscript']):
-                element.decompose()
-            
-            # Extract main content
-            text = soup.get_text(separator='\n')
-            text = re.sub(r'\s+', ' ', text).strip()
-            
-            if is_valid_content(text):
-                return extract_pairs(text)
+        tree = HTMLParser(data)
+
+        # Remove unwanted elements
+        for tag in ('script', 'style', 'nav', 'footer', 'header', 'noscript'):
+            for node in tree.css(tag):
+                node.decompose()
+
+        # Extract main content
+        text = tree.body.text(separator='\n') if tree.body else ''
+        text = re.sub(r'\s+', ' ', text).strip()
+
+        if is_valid_content(text):
+            return extract_pairs(text)
     except Exception as e:
-        print(f"Error processing HTML {url}: {e}")
+        print(f"Error processing HTML content: {e}")
     return []
 
 async def search_and_process(query, session, semaphore):
@@ -181,16 +218,20 @@ async def search_and_process(query, session, semaphore):
                 continue
             
             try:
-                # Determine content type
-                async with session.head(url) as response:
+                # One GET per URL: sniff the type from the response headers
+                # (or the URL suffix) and process the downloaded bytes —
+                # the old HEAD round-trip doubled latency and many servers
+                # answer it incorrectly anyway
+                async with session.get(url) as response:
                     content_type = response.headers.get('Content-Type', '')
-                    is_pdf = 'pdf' in content_type.lower()
-                
+                    is_pdf = 'pdf' in content_type.lower() or url.lower().endswith('.pdf')
+                    data = await response.read()
+
                 # Process content
                 if is_pdf:
-                    pairs = await process_pdf(url, session)
+                    pairs = process_pdf_bytes(data)
                 else:
-                    pairs = await process_html(url, session)
+                    pairs = process_html_bytes(data)
                 
                 # Prepare data entries
                 entries = []
@@ -205,7 +246,7 @@ async def search_and_process(query, session, semaphore):
                     print(f"Saved {len(entries)} pairs from {url}")
                 
                 save_processed_url(url)
-                time.sleep(random.uniform(1, 3))
+                await asyncio.sleep(random.uniform(1, 3))
                 
             except Exception as e:
                 print(f"Error processing {url}: {e}")
@@ -215,13 +256,22 @@ async def main():
     
     semaphore = asyncio.Semaphore(5)  # Concurrent requests
     timeout = aiohttp.ClientTimeout(total=20)
-    
-    async with aiohttp.ClientSession(headers={'User-Agent': get_random_user_agent()}, timeout=timeout) as session:
+    # Tuned connection pool: cap per-host fanout, cache DNS lookups, and keep
+    # connections alive so repeat hosts skip the TCP/TLS handshake
+    connector = aiohttp.TCPConnector(
+        limit=64,
+        limit_per_host=4,
+        ttl_dns_cache=300,
+        enable_cleanup_closed=True,
+        keepalive_timeout=60,
+    )
+
+    async with aiohttp.ClientSession(connector=connector, headers={'User-Agent': get_random_user_agent()}, timeout=timeout) as session:
         tasks = []
         for query in QUERIES:
             task = asyncio.create_task(search_and_process(query, session, semaphore))
             tasks.append(task)
-            time.sleep(0.5)  # Add delay between query starts
+            await asyncio.sleep(0.5)  # Add delay between query starts
         
         await asyncio.gather(*tasks)
 